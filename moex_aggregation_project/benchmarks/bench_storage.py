@@ -0,0 +1,116 @@
+"""
+Микробенчмарк сериализации CSV: построчный csv.writer против
+пакетного форматирования storage.format_csv.
+
+Запуск (из каталога moex_aggregation_project):
+    python benchmarks/bench_storage.py
+    python benchmarks/bench_storage.py --rows 3200 100000 1000000
+
+Данные — синтетическая история цен закрытия вида {"date", "close"}
+(3200 строк — примерно вся история одной акции на TQBR). Перед замером
+проверяется, что оба способа дают побайтно одинаковый результат — на этих
+данных и на наборе граничных случаев (экранирование, пустые значения,
+таблица из одного столбца).
+"""
+
+import argparse
+import csv
+import io
+import random
+import sys
+import timeit
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from moex_aggregation.storage import format_csv  # noqa: E402
+
+
+def make_prices(rows: int) -> List[Dict[str, Any]]:
+    random.seed(rows)
+    start = date(2000, 1, 3)
+    price = 100.0
+    records: List[Dict[str, Any]] = []
+    for i in range(rows):
+        price = round(max(0.01, price * (1 + random.gauss(0, 0.02))), 2)
+        records.append(
+            {
+                "date": (start + timedelta(days=i)).isoformat(),
+                # Иногда ISS отдает пустую цену закрытия
+                "close": None if i % 997 == 0 else price,
+            }
+        )
+    return records
+
+
+def rows_writer(records: List[Dict[str, Any]]) -> str:
+    """Прежний способ: csv.writer.writerow на каждую строку."""
+    f = io.StringIO(newline="")
+    writer = csv.writer(f)
+    writer.writerow(["date", "close"])
+    for item in records:
+        writer.writerow(
+            [
+                item.get("date"),
+                item.get("close"),
+            ]
+        )
+    return f.getvalue()
+
+
+# Граничные случаи: (заголовок, строки)
+EDGE_CASES: List[Tuple[List[str], List[List[Any]]]] = [
+    (["value"], [[""], [None], ["x"], [1.5]]),
+    ([""], [[""], ["a"]]),
+    (["date", "note"], [["2024-01-01", 'say "hi"'], ["2024-01-02", "a,b"], ["", None]]),
+    (["text"], [["line\r\nbreak"], ["cr\ronly"], [" padded "]]),
+    (["n", "flag", "price"], [[1, True, float("inf")], [None, False, -0.0], [0, None, 1e-300]]),
+]
+
+
+def check_edge_cases() -> None:
+    """Сравнивает format_csv с csv.writer на граничных случаях."""
+    for header, rows in EDGE_CASES:
+        f = io.StringIO(newline="")
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+        columns = [list(column) for column in zip(*rows)]
+        assert format_csv(header, columns) == f.getvalue(), f"вывод различается: {header}"
+
+
+def bulk_writer(records: List[Dict[str, Any]]) -> str:
+    """Новый способ: форматирование по столбцам за один проход."""
+    columns = [
+        [item.get("date") for item in records],
+        [item.get("close") for item in records],
+    ]
+    return format_csv(["date", "close"], columns)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[3200, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    check_edge_cases()
+    print(f"{'строк':>10} {'csv.writer, мс':>16} {'format_csv, мс':>16} {'ускорение':>10}")
+    for rows in args.rows:
+        records = make_prices(rows)
+        assert rows_writer(records) == bulk_writer(records), "вывод различается"
+
+        number = max(1, 100_000 // rows)
+        old = min(timeit.repeat(lambda: rows_writer(records), number=number, repeat=args.repeat))
+        new = min(timeit.repeat(lambda: bulk_writer(records), number=number, repeat=args.repeat))
+
+        old_ms = old / number * 1000
+        new_ms = new / number * 1000
+        print(f"{rows:>10} {old_ms:>16.2f} {new_ms:>16.2f} {old_ms / new_ms:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,15 @@
 """
 moex_aggregation — проект по агрегации рыночных данных с помощью
 асинхронных запросов к ISS API Московской биржи.
+
+Программный API:
+
+    from moex_aggregation import stream_ticker_data
+
+    async for data in stream_ticker_data(["SBER", "GMKN"], session):
+        ...  # data.ticker, data.dividends, data.prices
 """
+
+from .service import TickerData, stream_ticker_data
+
+__all__ = ["TickerData", "stream_ticker_data"]
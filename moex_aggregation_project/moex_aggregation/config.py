@@ -1,4 +1,6 @@
+from datetime import time, timedelta, timezone
 from pathlib import Path
+from typing import Dict, Optional
 
 # Путь к файлу с тикерами
 TICKERS_FILE: Path = Path("tickers.txt")
@@ -20,3 +22,64 @@ USER_AGENT: str = "AsyncMoexClient/1.0 (educational project)"
 
 # Таймаут HTTP-сессии (секунды)
 HTTP_TIMEOUT: int = 60
+
+# Максимальное количество соединений в пуле HTTP-сессии (всего и на один хост)
+HTTP_CONNECTION_LIMIT: int = 20
+HTTP_CONNECTION_LIMIT_PER_HOST: int = 10
+
+# Время жизни записей кэша DNS (секунды)
+HTTP_DNS_CACHE_TTL: int = 600
+
+# Сколько держать простаивающее keep-alive соединение открытым (секунды)
+HTTP_KEEPALIVE_TIMEOUT: float = 120
+
+# Часовой пояс биржи (MSK, UTC+3, без перехода на летнее время)
+EXCHANGE_TZ: timezone = timezone(timedelta(hours=3), "MSK")
+
+# Основная торговая сессия (время биржи): от аукциона открытия до аукциона закрытия
+EXCHANGE_OPEN: time = time(9, 50)
+EXCHANGE_CLOSE: time = time(18, 50)
+
+# Период обновления данных в режиме демона (секунды)
+DAEMON_INTERVAL: int = 300
+
+# Использовать uvloop вместо стандартного цикла событий asyncio (если установлен)
+USE_UVLOOP: bool = False
+
+# Включить мониторинг задержки цикла событий (event loop lag)
+LOOP_LAG_MONITOR: bool = False
+
+# Период опроса цикла событий монитором задержки (секунды)
+LOOP_LAG_INTERVAL: float = 0.05
+
+# Порог задержки, после которого логируется выполняющаяся корутина (секунды)
+LOOP_LAG_THRESHOLD: float = 0.1
+
+# Гистограмма задержек: ширина корзины и верхняя граница (секунды)
+LOOP_LAG_BUCKET: float = 0.001
+LOOP_LAG_HISTOGRAM_MAX: float = 10.0
+
+# Эталонный тикер режима TQBR для торгового календаря (--validate / --repair):
+# его история, загруженная из ISS, задает даты торгов режима
+CALENDAR_REFERENCE_TICKER: str = "SBER"
+
+# Файл (в OUTPUT_DIR) с кэшем дат торгов эталонного тикера:
+# при каждой проверке догружаются только даты после последней сохраненной
+REFERENCE_CALENDAR_FILENAME: str = "reference_calendar.json"
+
+# Файл (в OUTPUT_DIR) с известными пропусками — датами, которые ISS
+# не вернул при запросе окна (остановки торгов и т.п.)
+KNOWN_GAPS_FILENAME: str = "known_gaps.json"
+
+# Файл для трассировки в формате Chrome trace-event (флаг --trace)
+TRACE_FILE: Path = Path("trace.json")
+
+# Сжатие выходных файлов для каждого набора данных: None, "gzip" или "zstd"
+DIVIDENDS_COMPRESSION: Optional[str] = None
+PRICES_COMPRESSION: Optional[str] = None
+
+# Уровень сжатия для каждого формата
+COMPRESSION_LEVELS: Dict[str, int] = {
+    "gzip": 6,
+    "zstd": 3,
+}
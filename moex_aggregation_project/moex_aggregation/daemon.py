@@ -0,0 +1,209 @@
+"""
+Режим демона: периодическое обновление данных в одном процессе.
+
+В отличие от однократного запуска, здесь:
+- одна HTTP-сессия с пулом keep-alive соединений и кэшем DNS живет
+  все время работы, поэтому цикл обновления не платит за запуск
+  интерпретатора, импорты, DNS и установку TCP-соединений;
+- циклы обновления запускаются по расписанию, выровненному по
+  торговой сессии биржи;
+- список тикеров перечитывается из файла перед каждым циклом,
+  перезапуск для его изменения не нужен;
+- цикл обновления инкрементальный: для каждого тикера запрашивается
+  только история с последней сохраненной даты;
+- сигнал остановки прерывает и текущий цикл, а не только ожидание;
+- задержка цикла событий, сжатие и трассировка отчитываются
+  и сбрасываются по каждому циклу.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+import aiohttp
+
+from . import config
+from . import storage
+from . import tracing
+from .event_loop import LoopLagMonitor
+from .service import create_session, process_all_tickers
+
+logger = logging.getLogger(__name__)
+
+
+def next_refresh_time(
+    now: datetime,
+    interval: int = config.DAEMON_INTERVAL,
+) -> datetime:
+    """
+    Возвращает время следующего цикла обновления после now.
+
+    В рабочие дни циклы идут от EXCHANGE_OPEN с шагом interval секунд,
+    последний цикл — ровно в EXCHANGE_CLOSE (фиксирует цены закрытия).
+    Вне торговой сессии и в выходные — ближайшее открытие.
+    Праздничные дни биржи не учитываются.
+    """
+    if interval <= 0:
+        raise ValueError(f"Период обновления должен быть положительным: {interval}")
+
+    now = now.astimezone(config.EXCHANGE_TZ)
+    day = now.date()
+
+    while True:
+        if day.weekday() < 5:
+            open_at = datetime.combine(day, config.EXCHANGE_OPEN, config.EXCHANGE_TZ)
+            close_at = datetime.combine(day, config.EXCHANGE_CLOSE, config.EXCHANGE_TZ)
+
+            if now < open_at:
+                return open_at
+
+            if now < close_at:
+                steps = math.floor((now - open_at).total_seconds() / interval) + 1
+                return min(open_at + timedelta(seconds=steps * interval), close_at)
+
+        day += timedelta(days=1)
+
+
+def _install_stop_handlers(stop: asyncio.Event) -> None:
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Windows: обработчики сигналов в цикле событий не поддерживаются,
+            # остановка по Ctrl+C обрабатывается в точке входа.
+            pass
+
+
+def cycle_trace_path(trace_path: Path, cycle: int) -> Path:
+    """Файл трассировки цикла: trace.json -> trace-0001.json."""
+    return trace_path.with_name(f"{trace_path.stem}-{cycle:04d}{trace_path.suffix}")
+
+
+def _report_cycle(
+    cycle: int,
+    monitor: Optional[LoopLagMonitor],
+    trace_path: Optional[Path],
+) -> None:
+    """Выводит метрики цикла и начинает новый период измерений."""
+    if monitor is not None:
+        logger.info(f"Цикл обновления #{cycle}: {monitor.summary(reset=True)}")
+
+    compression = storage.compression_stats.summary(reset=True)
+    if compression is not None:
+        logger.info(f"Цикл обновления #{cycle}: {compression}")
+
+    if trace_path is not None:
+        tracer = tracing.disable()
+        if tracer is not None:
+            tracing.enable()
+            tracer.dump(cycle_trace_path(trace_path, cycle))
+
+
+async def _run_cycle(
+    cycle: int,
+    session: aiohttp.ClientSession,
+    executor: ThreadPoolExecutor,
+    stop: asyncio.Event,
+) -> Optional[List[str]]:
+    """
+    Выполняет цикл обновления как отдельную задачу, соревнующуюся
+    с сигналом остановки: при остановке цикл отменяется.
+
+    Возвращает список тикеров или None, если цикл прерван или завершился ошибкой.
+    """
+    task = asyncio.ensure_future(process_all_tickers(session, executor, incremental=True))
+    stopped = asyncio.ensure_future(stop.wait())
+
+    try:
+        await asyncio.wait({task, stopped}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopped.cancel()
+        if not task.done():
+            task.cancel()
+            # Дожидаемся отмены, чтобы не оставлять работу после выхода
+            await asyncio.gather(task, return_exceptions=True)
+
+    if task.cancelled():
+        logger.info(f"Цикл обновления #{cycle} прерван сигналом остановки.")
+        return None
+
+    try:
+        return task.result()
+    except Exception as e:
+        logger.exception(f"Цикл обновления #{cycle} завершился ошибкой: {e}")
+        return None
+
+
+async def run_daemon(
+    interval: int = config.DAEMON_INTERVAL,
+    stop: Optional[asyncio.Event] = None,
+    monitor: Optional[LoopLagMonitor] = None,
+    trace_path: Optional[Path] = None,
+) -> None:
+    """
+    Основной цикл демона: обновление данных по расписанию до сигнала остановки.
+
+    Первый цикл выполняется сразу при запуске, следующие — по
+    расписанию next_refresh_time(). После каждого цикла выводятся
+    метрики monitor и сжатия, а трассировка (если включена)
+    сохраняется в отдельный файл рядом с trace_path.
+    """
+    if interval <= 0:
+        raise ValueError(f"Период обновления должен быть положительным: {interval}")
+
+    if stop is None:
+        stop = asyncio.Event()
+        _install_stop_handlers(stop)
+
+    executor = ThreadPoolExecutor(max_workers=config.MAX_WORKERS)
+    previous: List[str] = []
+    cycle = 0
+
+    try:
+        async with create_session() as session:
+            while not stop.is_set():
+                cycle += 1
+                started = time.perf_counter()
+
+                try:
+                    tickers = await _run_cycle(cycle, session, executor, stop)
+                finally:
+                    _report_cycle(cycle, monitor, trace_path)
+
+                if tickers is not None:
+                    added = sorted(set(tickers) - set(previous))
+                    removed = sorted(set(previous) - set(tickers))
+                    if previous and (added or removed):
+                        logger.info(
+                            f"Список тикеров изменился: добавлены {added}, удалены {removed}"
+                        )
+                    previous = tickers
+
+                    logger.info(
+                        f"Цикл обновления #{cycle}: {len(tickers)} тикеров "
+                        f"за {time.perf_counter() - started:.2f} с"
+                    )
+
+                if stop.is_set():
+                    break
+
+                next_at = next_refresh_time(datetime.now(config.EXCHANGE_TZ), interval)
+                delay = (next_at - datetime.now(config.EXCHANGE_TZ)).total_seconds()
+                logger.info(f"Следующий цикл обновления: {next_at:%Y-%m-%d %H:%M:%S %Z}")
+
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=max(delay, 0.0))
+                except asyncio.TimeoutError:
+                    pass
+    finally:
+        executor.shutdown(wait=True)
+        logger.info("Демон остановлен.")
@@ -0,0 +1,201 @@
+"""
+Модуль для настройки и мониторинга цикла событий.
+
+Здесь:
+- опциональная установка uvloop в качестве реализации цикла событий,
+- монитор задержки цикла (event loop lag), который показывает,
+  когда синхронный код (разбор JSON, построение словарей) блокирует
+  все одновременно выполняющиеся запросы.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+import sys
+import threading
+import time
+import traceback
+from typing import List, Optional
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+def install_uvloop() -> bool:
+    """
+    Устанавливает политику цикла событий uvloop.
+
+    uvloop — необязательная зависимость: если пакет не установлен,
+    пишет предупреждение в лог и оставляет стандартный цикл asyncio.
+    Возвращает True, если uvloop установлен.
+    """
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("uvloop не установлен, используется стандартный цикл asyncio.")
+        return False
+
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("Используется цикл событий uvloop.")
+    return True
+
+
+class LoopLagMonitor:
+    """
+    Монитор задержки цикла событий.
+
+    Фоновая задача периодически засыпает на interval секунд и измеряет,
+    насколько позже запланированного времени она была разбужена.
+    Эта разница и есть задержка планирования, которую испытывает каждая
+    корутина в цикле.
+
+    Отдельный сторожевой поток следит за «пульсом» фоновой задачи:
+    если цикл не отвечает дольше threshold, поток снимает стек потока
+    цикла событий и логирует корутину, которая в этот момент выполняется.
+
+    Замеры не хранятся, а раскладываются по гистограмме с корзинами
+    фиксированной ширины (bucket секунд, до max_lag секунд), поэтому
+    память не растет при долгой работе. p99 вычисляется с точностью
+    до ширины корзины. Для отчетов по периодам (например, по циклам
+    демона) используйте summary(reset=True).
+    """
+
+    def __init__(
+        self,
+        interval: float = config.LOOP_LAG_INTERVAL,
+        threshold: float = config.LOOP_LAG_THRESHOLD,
+        bucket: float = config.LOOP_LAG_BUCKET,
+        max_lag: float = config.LOOP_LAG_HISTOGRAM_MAX,
+    ) -> None:
+        self.interval = interval
+        self.threshold = threshold
+        self.bucket = bucket
+
+        # Последняя корзина — переполнение (все замеры от max_lag и выше)
+        self._buckets: List[int] = [0] * (math.ceil(max_lag / bucket) + 1)
+        self.count = 0
+        self.over_threshold = 0
+        self.max_lag = 0.0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._heartbeat = time.monotonic()
+
+    def start(self) -> None:
+        """Запускает фоновую задачу и сторожевой поток (вызывать внутри цикла)."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop_event.clear()
+
+        self._task = self._loop.create_task(self._sample(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(
+            target=self._watch,
+            name="loop-lag-watchdog",
+            daemon=True,
+        )
+        self._watchdog.start()
+
+    async def stop(self) -> None:
+        """Останавливает мониторинг."""
+        self._stop_event.set()
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+
+            self._add(lag)
+            self._heartbeat = time.monotonic()
+
+            if lag > self.threshold:
+                logger.warning(f"Задержка цикла событий: {lag * 1000:.1f} мс")
+
+    def _watch(self) -> None:
+        # Стек снимается один раз за каждую «остановку» цикла
+        reported_heartbeat = None
+        while not self._stop_event.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled > self.threshold and heartbeat != reported_heartbeat:
+                reported_heartbeat = heartbeat
+                self._report_stall(stalled)
+
+    def _report_stall(self, stalled: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+
+        task = asyncio.current_task(self._loop)
+        if task is not None:
+            coro = task.get_coro()
+            running = f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+        else:
+            running = "вне задачи (callback цикла)"
+
+        stack = "".join(traceback.format_stack(frame, limit=8))
+        logger.warning(
+            f"Цикл событий заблокирован уже {stalled * 1000:.0f} мс, "
+            f"выполняется: {running}\n{stack}"
+        )
+
+    def _add(self, lag: float) -> None:
+        index = min(int(lag / self.bucket), len(self._buckets) - 1)
+        self._buckets[index] += 1
+        self.count += 1
+        if lag > self.threshold:
+            self.over_threshold += 1
+        if lag > self.max_lag:
+            self.max_lag = lag
+
+    def reset(self) -> None:
+        """Начинает новый период измерений."""
+        self._buckets = [0] * len(self._buckets)
+        self.count = 0
+        self.over_threshold = 0
+        self.max_lag = 0.0
+
+    @property
+    def p99_lag(self) -> float:
+        """Верхняя граница корзины, в которую попадает 99-й перцентиль."""
+        if not self.count:
+            return 0.0
+
+        rank = math.ceil(0.99 * self.count)
+        seen = 0
+        for index, n in enumerate(self._buckets):
+            seen += n
+            if seen >= rank:
+                return min((index + 1) * self.bucket, self.max_lag)
+        return self.max_lag
+
+    def summary(self, reset: bool = False) -> str:
+        """Строка для отчета; reset=True начинает новый период."""
+        text = (
+            f"Задержка цикла событий: max={self.max_lag * 1000:.1f} мс, "
+            f"p99={self.p99_lag * 1000:.1f} мс, "
+            f"замеров={self.count}, выше порога={self.over_threshold}"
+        )
+        if reset:
+            self.reset()
+        return text
@@ -2,19 +2,46 @@
 Модуль для работы с ISS API Московской биржи.
 
 Здесь нет логики сохранения — только HTTP-запросы и разбор JSON.
+Сами запросы выполняет подключаемый транспорт (см. transport.py):
+по умолчанию — обычный HTTP, для офлайн-запусков — запись/воспроизведение.
 """
 
 from __future__ import annotations
 
+import json
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 import aiohttp
 
 from . import config
+from . import tracing
+from .transport import HttpTransport, Transport
 
 logger = logging.getLogger(__name__)
 
+HISTORY_URL = (
+    "http://iss.moex.com/iss/history/engines/stock/"
+    "markets/shares/boards/TQBR/securities/{ticker}.json"
+)
+HISTORY_DATES_URL = (
+    "http://iss.moex.com/iss/history/engines/stock/"
+    "markets/shares/boards/TQBR/securities/{ticker}/dates.json"
+)
+
+_transport: Transport = HttpTransport()
+
+
+def set_transport(transport: Transport) -> Transport:
+    """
+    Устанавливает транспорт для всех запросов модуля.
+
+    Возвращает предыдущий транспорт.
+    """
+    global _transport
+    previous, _transport = _transport, transport
+    return previous
+
 
 async def fetch_json(
     session: aiohttp.ClientSession,
@@ -26,10 +53,11 @@ async def fetch_json(
 
     При ошибочном статус-коде поднимает исключение aiohttp.ClientResponseError.
     """
-    async with session.get(url, params=params) as response:
-        response.raise_for_status()
-        data = await response.json()
-        return data
+    body = await _transport.get(session, url, params)
+
+    with tracing.span("json_decode", bytes=len(body)):
+        data = json.loads(body)
+    return data
 
 
 async def fetch_dividends(
@@ -49,7 +77,8 @@ async def fetch_dividends(
     url = f"http://iss.moex.com/iss/securities/{ticker}/dividends.json"
     logger.info(f"[{ticker}] Запрос дивидендов: {url}")
 
-    data = await fetch_json(session, url)
+    with tracing.span("fetch_dividends", ticker=ticker):
+        data = await fetch_json(session, url)
     div_section = data.get("dividends")
 
     if not div_section:
@@ -88,26 +117,32 @@ async def fetch_history_page(
     session: aiohttp.ClientSession,
     ticker: str,
     start: int = 0,
+    date_from: Optional[str] = None,
+    date_till: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
     Получает одну "страницу" истории котировок (до 100 записей) по тикеру,
     начиная с позиции 'start' (offset).
 
+    date_from / date_till ("YYYY-MM-DD") ограничивают историю окном дат,
+    позиция 'start' тогда отсчитывается от начала окна.
+
     Возвращает список словарей:
         {
             "date": "YYYY-MM-DD",
             "close": <float или None>,
         }
     """
-    base_url = (
-        "http://iss.moex.com/iss/history/engines/stock/"
-        "markets/shares/boards/TQBR/securities/{ticker}.json"
-    )
-    url = base_url.format(ticker=ticker)
-    params = {"start": start}
+    url = HISTORY_URL.format(ticker=ticker)
+    params: Dict[str, Any] = {"start": start}
+    if date_from is not None:
+        params["from"] = date_from
+    if date_till is not None:
+        params["till"] = date_till
 
     logger.info(f"[{ticker}] Запрос истории цен, start={start}")
-    data = await fetch_json(session, url, params=params)
+    with tracing.span("fetch_history_page", ticker=ticker, start=start):
+        data = await fetch_json(session, url, params=params)
 
     history = data.get("history")
     if not history:
@@ -144,9 +179,12 @@ async def fetch_full_history(
     session: aiohttp.ClientSession,
     ticker: str,
     page_size: int = config.HISTORY_PAGE_SIZE,
+    date_from: Optional[str] = None,
+    date_till: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Получает всю доступную историю котировок по тикеру,
+    Получает всю доступную историю котировок по тикеру
+    (или только окно дат date_from..date_till),
     обходя ограничение API на количество записей в одном ответе.
 
     Стратегия:
@@ -157,7 +195,9 @@ async def fetch_full_history(
 
     start = 0
     while True:
-        page = await fetch_history_page(session, ticker, start=start)
+        page = await fetch_history_page(
+            session, ticker, start=start, date_from=date_from, date_till=date_till
+        )
         if not page:
             break
 
@@ -170,3 +210,32 @@ async def fetch_full_history(
 
     logger.info(f"[{ticker}] Получено записей истории: {len(all_records)}")
     return all_records
+
+
+async def fetch_history_dates(
+    session: aiohttp.ClientSession,
+    ticker: str,
+) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Получает границы доступной истории котировок по тикеру на режиме торгов.
+
+    Возвращает кортеж ("YYYY-MM-DD", "YYYY-MM-DD") — первая и последняя
+    дата торгов, или (None, None), если данных нет.
+    """
+    url = HISTORY_DATES_URL.format(ticker=ticker)
+    logger.info(f"[{ticker}] Запрос границ истории: {url}")
+
+    data = await fetch_json(session, url)
+    dates = data.get("dates")
+    if not dates or not dates.get("data"):
+        logger.warning(f"[{ticker}] В ответе нет границ истории (секция 'dates').")
+        return None, None
+
+    columns = dates.get("columns", [])
+    row = dates["data"][0]
+
+    try:
+        return row[columns.index("from")], row[columns.index("till")]
+    except ValueError as e:
+        logger.error(f"[{ticker}] Не найдены колонки from или till: {e}")
+        return None, None
@@ -3,9 +3,11 @@
 
 Здесь:
 - создание HTTP-сессии,
+- потоковое получение данных по тикерам (stream_ticker_data) —
+  программный API без записи на диск,
 - управление пулом потоков,
 - семафор для ограничения параллелизма,
-- обработка всех тикеров.
+- обработка всех тикеров с сохранением в CSV.
 """
 
 from __future__ import annotations
@@ -13,6 +15,19 @@ from __future__ import annotations
 import asyncio
 import logging
 from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Union,
+)
 
 import aiohttp
 
@@ -20,88 +35,357 @@ from . import config
 from .tickers import ticker_generator
 from . import moex_client
 from . import storage
+from . import tracing
 
 logger = logging.getLogger(__name__)
 
 
-async def process_one_ticker(
+class _TickerDataFields(NamedTuple):
+    ticker: str
+    dividends: List[Dict[str, Any]]
+    prices: List[Dict[str, Any]]
+
+
+class TickerData(_TickerDataFields):
+    """
+    Результат обработки одного тикера — кортеж (ticker, dividends, prices).
+
+    Если обработка завершилась ошибкой, она хранится в атрибуте error
+    (не входит в кортеж, распаковка на три значения работает всегда),
+    а dividends и prices — пустые списки.
+    """
+
+    error: Optional[BaseException]
+
+    def __new__(
+        cls,
+        ticker: str,
+        dividends: List[Dict[str, Any]],
+        prices: List[Dict[str, Any]],
+        error: Optional[BaseException] = None,
+    ) -> "TickerData":
+        self = super().__new__(cls, ticker, dividends, prices)
+        self.error = error
+        return self
+
+
+async def fetch_ticker_data(
     ticker: str,
     session: aiohttp.ClientSession,
-    executor: ThreadPoolExecutor,
-) -> None:
+) -> TickerData:
     """
-    Обработка одного тикера:
+    Получение данных одного тикера:
         1. Получить дивиденды.
         2. Получить полную историю цен закрытия.
-        3. Сохранить данные в CSV (через пул потоков).
     """
     logger.info(f"[{ticker}] Начало обработки тикера")
 
-    try:
+    with tracing.span("fetch_ticker_data", ticker=ticker):
         dividends = await moex_client.fetch_dividends(session, ticker)
-        history = await moex_client.fetch_full_history(session, ticker)
-
-        loop = asyncio.get_running_loop()
-
-        if dividends:
-            await loop.run_in_executor(
-                executor,
-                storage.save_dividends_to_csv,
-                ticker,
-                dividends,
-                config.OUTPUT_DIR,
-            )
+        prices = await moex_client.fetch_full_history(session, ticker)
+
+    return TickerData(ticker, dividends, prices)
+
+
+async def stream_ticker_data(
+    tickers: Union[Iterable[str], AsyncIterable[str]],
+    session: Optional[aiohttp.ClientSession] = None,
+    max_concurrent: Optional[int] = None,
+) -> AsyncIterator[TickerData]:
+    """
+    Асинхронный итератор по результатам обработки тикеров — без записи на диск.
+
+    Результаты выдаются по мере готовности (а не в порядке тикеров),
+    одновременно обрабатывается не более max_concurrent тикеров.
+    Тикеры могут поступать из обычного или асинхронного итерируемого объекта;
+    обработка начинается, не дожидаясь конца входной последовательности.
+
+    Если session не передана, создается своя сессия на время итерации.
+    max_concurrent по умолчанию — config.MAX_CONCURRENT_REQUESTS.
+
+    Каждый тикер выдается ровно один раз: при ошибке обработки —
+    с исключением в поле error, поэтому «ошибка» отличима от «нет тикера».
+
+    Пример:
+        async for data in stream_ticker_data(["SBER", "GMKN"]):
+            if data.error is not None:
+                ...
+            print(data.ticker, len(data.prices))
+    """
+    if session is None:
+        async with create_session() as own_session:
+            async for data in stream_ticker_data(tickers, own_session, max_concurrent):
+                yield data
+        return
+
+    if max_concurrent is None:
+        max_concurrent = config.MAX_CONCURRENT_REQUESTS
+    semaphore = asyncio.Semaphore(max_concurrent)
+    # Сюда попадают завершенные задачи (и задача чтения тикеров) в порядке готовности
+    done_queue: asyncio.Queue = asyncio.Queue()
+    pending: Set[asyncio.Task] = set()
+
+    async def fetch_one(ticker: str) -> TickerData:
+        tracing.set_lane(ticker)
+        with tracing.span("semaphore_wait", ticker=ticker):
+            await semaphore.acquire()
+        try:
+            return await fetch_ticker_data(ticker, session)
+        except Exception as e:
+            logger.exception(f"[{ticker}] Ошибка при обработке тикера: {e}")
+            return TickerData(ticker, [], [], error=e)
+        finally:
+            semaphore.release()
+
+    def start(ticker: str) -> None:
+        ticker = ticker.strip().upper()
+        if not ticker:
+            return
+        task = asyncio.create_task(fetch_one(ticker))
+        pending.add(task)
+        task.add_done_callback(done_queue.put_nowait)
+
+    async def feed() -> None:
+        if isinstance(tickers, AsyncIterable):
+            async for ticker in tickers:
+                start(ticker)
+        else:
+            for ticker in tickers:
+                start(ticker)
+
+    feeder = asyncio.create_task(feed())
+    feeder.add_done_callback(done_queue.put_nowait)
+    feeding = True
+
+    try:
+        while feeding or pending:
+            task = await done_queue.get()
+            if task is feeder:
+                feeding = False
+                # Пробрасываем ошибку чтения входной последовательности
+                feeder.result()
+                continue
+
+            pending.discard(task)
+            yield task.result()
+    finally:
+        # Потребитель мог прервать итерацию — отменяем незавершенную работу
+        feeder.cancel()
+        for task in pending:
+            task.cancel()
+
+
+async def _save_dataset(
+    executor: ThreadPoolExecutor,
+    dataset: str,
+    ticker: str,
+    records: List[Dict[str, Any]],
+    output_dir: Path,
+) -> None:
+    """Записывает набор данных тикера ("dividends" или "prices") в пуле потоков."""
+    if dataset == "dividends":
+        save, compression = storage.save_dividends_to_csv, config.DIVIDENDS_COMPRESSION
+    else:
+        save, compression = storage.save_prices_to_csv, config.PRICES_COMPRESSION
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(
+        executor,
+        tracing.traced_call(
+            f"write_{dataset}",
+            save,
+            ticker,
+            records,
+            output_dir,
+            compression,
+            ticker=ticker,
+            rows=len(records),
+        ),
+    )
+
+
+async def save_ticker_data(
+    data: TickerData,
+    executor: ThreadPoolExecutor,
+    output_dir: Optional[Path] = None,
+) -> None:
+    """
+    Сохраняет данные тикера в CSV (через пул потоков).
+
+    output_dir по умолчанию — config.OUTPUT_DIR на момент вызова.
+    """
+    ticker = data.ticker
+    if output_dir is None:
+        output_dir = config.OUTPUT_DIR
+    tracing.set_lane(ticker)
+
+    try:
+        if data.dividends:
+            await _save_dataset(executor, "dividends", ticker, data.dividends, output_dir)
         else:
             logger.info(f"[{ticker}] Дивиденды не найдены, CSV не создаем.")
 
-        if history:
-            await loop.run_in_executor(
-                executor,
-                storage.save_prices_to_csv,
-                ticker,
-                history,
-                config.OUTPUT_DIR,
-            )
+        if data.prices:
+            await _save_dataset(executor, "prices", ticker, data.prices, output_dir)
         else:
             logger.info(f"[{ticker}] История цен не найдена, CSV не создаем.")
 
         logger.info(f"[{ticker}] Обработка завершена успешно")
 
     except Exception as e:
-        logger.exception(f"[{ticker}] Ошибка при обработке тикера: {e}")
+        logger.exception(f"[{ticker}] Ошибка при сохранении данных тикера: {e}")
 
 
-async def run_all_tickers() -> None:
+async def _read_dataset(
+    executor: ThreadPoolExecutor,
+    dataset: str,
+    ticker: str,
+    output_dir: Path,
+) -> Optional[List[Dict[str, Any]]]:
+    """Читает сохраненный набор данных тикера в пуле потоков (None, если файла нет)."""
+    path = storage.find_dataset(output_dir, ticker, dataset)
+    if path is None:
+        return None
+
+    read = storage.read_dividends_csv if dataset == "dividends" else storage.read_prices_csv
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor,
+        tracing.traced_call(f"read_{dataset}", read, path, ticker=ticker),
+    )
+
+
+async def update_ticker(
+    ticker: str,
+    session: aiohttp.ClientSession,
+    executor: ThreadPoolExecutor,
+    output_dir: Optional[Path] = None,
+) -> None:
     """
-    Основная точка входа асинхронного кода:
-        - создает пул потоков,
-        - создает HTTP-сессию aiohttp,
-        - читает тикеры из файла,
-        - ограничивает количество одновременных задач семафором,
-        - ждет завершения всех задач.
+    Инкрементальное обновление тикера (для режима демона).
+
+    История цен запрашивается только начиная с последней сохраненной даты
+    (ее цена закрытия могла измениться за время сессии) и вклеивается
+    в сохраненный ряд. Файлы, содержимое которых не изменилось,
+    не перезаписываются. Если сохраненной истории нет — полная загрузка.
     """
-    executor = ThreadPoolExecutor(max_workers=config.MAX_WORKERS)
-    semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_REQUESTS)
+    if output_dir is None:
+        output_dir = config.OUTPUT_DIR
+    tracing.set_lane(ticker)
+
+    stored_prices = await _read_dataset(executor, "prices", ticker, output_dir)
+    if not stored_prices:
+        data = await fetch_ticker_data(ticker, session)
+        await save_ticker_data(data, executor, output_dir)
+        return
+
+    stored_dividends = await _read_dataset(executor, "dividends", ticker, output_dir)
+    last_date = max(item["date"] for item in stored_prices)
+
+    with tracing.span("update_ticker", ticker=ticker, date_from=last_date):
+        dividends = await moex_client.fetch_dividends(session, ticker)
+        fresh = await moex_client.fetch_full_history(session, ticker, date_from=last_date)
+
+    prices = storage.splice_records(stored_prices, fresh)
+    logger.info(
+        f"[{ticker}] Обновление с {last_date}: получено записей {len(fresh)}, "
+        f"строк было {len(stored_prices)}, стало {len(prices)}"
+    )
+
+    if dividends and dividends != stored_dividends:
+        await _save_dataset(executor, "dividends", ticker, dividends, output_dir)
+    if prices != stored_prices:
+        await _save_dataset(executor, "prices", ticker, prices, output_dir)
+    else:
+        logger.info(f"[{ticker}] История цен не изменилась, файл не перезаписываем.")
+
+
+def create_session() -> aiohttp.ClientSession:
+    """
+    Создает HTTP-сессию aiohttp с настроенным пулом соединений:
+        - keep-alive соединений между запросами,
+        - кэш DNS,
+        - ограничение числа соединений, в том числе на один хост.
 
+    Вызывать внутри работающего цикла событий.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=config.HTTP_CONNECTION_LIMIT,
+        limit_per_host=config.HTTP_CONNECTION_LIMIT_PER_HOST,
+        ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+    )
     timeout = aiohttp.ClientTimeout(total=config.HTTP_TIMEOUT)
     headers = {"User-Agent": config.USER_AGENT}
 
-    async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-        tasks = []
+    return aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers)
+
+
+async def process_all_tickers(
+    session: aiohttp.ClientSession,
+    executor: ThreadPoolExecutor,
+    incremental: bool = False,
+) -> List[str]:
+    """
+    Обрабатывает все тикеры из файла в уже открытой сессии:
+        - читает тикеры из файла (при каждом вызове заново),
+        - получает данные через stream_ticker_data,
+        - сохраняет каждый готовый результат в CSV, не дожидаясь остальных.
+
+    При incremental=True вместо полной загрузки тикеры обновляются
+    через update_ticker (догрузка с последней сохраненной даты).
+
+    При отмене отменяет и незавершенную работу по всем тикерам.
+    Возвращает список обработанных тикеров.
+    """
+    tickers = [
+        ticker.strip().upper()
+        async for ticker in ticker_generator(config.TICKERS_FILE)
+    ]
+
+    if incremental:
+        semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_REQUESTS)
+
+        async def update_one(ticker: str) -> None:
+            async with semaphore:
+                try:
+                    await update_ticker(ticker, session, executor)
+                except Exception as e:
+                    logger.exception(f"[{ticker}] Ошибка при обновлении тикера: {e}")
 
-        async for ticker in ticker_generator(config.TICKERS_FILE):
-            ticker = ticker.strip().upper()
-            if not ticker:
+        # gather при отмене сам отменяет все задачи обновления
+        await asyncio.gather(*(update_one(ticker) for ticker in tickers))
+        return tickers
+
+    saves = []
+    try:
+        async for data in stream_ticker_data(tickers, session):
+            if data.error is not None:
+                # Ошибка уже залогирована; частичных данных нет, файлы не трогаем
                 continue
+            saves.append(asyncio.create_task(save_ticker_data(data, executor)))
+
+        if saves:
+            await asyncio.gather(*saves)
+    except asyncio.CancelledError:
+        for task in saves:
+            task.cancel()
+        raise
 
-            async def sem_task(t: str) -> None:
-                async with semaphore:
-                    await process_one_ticker(t, session, executor)
+    return tickers
 
-            tasks.append(asyncio.create_task(sem_task(ticker)))
 
-        if tasks:
-            await asyncio.gather(*tasks)
+async def run_all_tickers() -> None:
+    """
+    Основная точка входа асинхронного кода:
+        - создает пул потоков,
+        - создает HTTP-сессию aiohttp,
+        - обрабатывает все тикеры из файла.
+    """
+    executor = ThreadPoolExecutor(max_workers=config.MAX_WORKERS)
+
+    async with create_session() as session:
+        await process_all_tickers(session, executor)
 
     executor.shutdown(wait=True)
     logger.info("Все тикеры обработаны.")
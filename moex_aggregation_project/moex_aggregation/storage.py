@@ -3,41 +3,293 @@
 
 Здесь — исключительно синхронные функции записи,
 которые затем вызываются через run_in_executor.
+
+Запись выполняется «пачкой»: весь CSV форматируется по столбцам
+за один проход в одну строку и записывается одним вызовом write,
+вместо вызова csv.writer.writerow на каждую строку. Результат
+побайтно совпадает с выводом csv.writer (разделитель ",", строки
+"\r\n", минимальное экранирование, float через repr — без потери точности).
+
+Файлы могут сжиматься (gzip или zstd) потоково, прямо при записи CSV
+в потоке пула, без промежуточного несжатого файла. Формат выбирается
+для каждого набора данных отдельно, а функции чтения определяют его
+автоматически по сигнатуре файла.
 """
 
+from contextlib import ExitStack, contextmanager
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
 import csv
+import gzip
+import io
 import logging
+import re
+import threading
+import time
+
+from . import config
 
 logger = logging.getLogger(__name__)
 
+# Суффиксы имен файлов для поддерживаемых форматов сжатия
+COMPRESSION_SUFFIXES: Dict[Optional[str], str] = {
+    None: "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+# Допустимые уровни сжатия для каждого формата (включительно)
+COMPRESSION_LEVEL_RANGES: Dict[str, Tuple[int, int]] = {
+    "gzip": (0, 9),
+    "zstd": (1, 22),
+}
+
+# Символы, при наличии которых csv.writer (QUOTE_MINIMAL) берет поле в кавычки
+_QUOTED_CHARS = '",\r\n'
+_NEEDS_QUOTING = re.compile(f"[{_QUOTED_CHARS}]")
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _import_zstd():
+    """zstandard — необязательная зависимость, нужна только для формата zstd."""
+    try:
+        import zstandard
+    except ImportError as e:
+        raise RuntimeError(
+            "Для формата zstd нужен пакет zstandard: pip install zstandard"
+        ) from e
+    return zstandard
+
+
+class _CountingWriter(io.RawIOBase):
+    """Бинарный поток-обертка, считающий количество записанных (несжатых) байт."""
+
+    def __init__(self, inner: Any) -> None:
+        super().__init__()
+        self._inner = inner
+        self.bytes_written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._inner.write(data)
+        n = len(memoryview(data).cast("B"))
+        self.bytes_written += n
+        return n
+
+
+class CompressionStats:
+    """
+    Суммарная статистика сжатия за период (запуск или цикл демона):
+    по ней, в отличие от логов отдельных файлов, удобно подбирать уровень.
+    Обновляется из потоков пула, поэтому защищена блокировкой.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.files = 0
+            self.raw_bytes = 0
+            self.stored_bytes = 0
+            self.seconds = 0.0
+
+    def add(self, raw_bytes: int, stored_bytes: int, seconds: float) -> None:
+        with self._lock:
+            self.files += 1
+            self.raw_bytes += raw_bytes
+            self.stored_bytes += stored_bytes
+            self.seconds += seconds
+
+    def summary(self, reset: bool = False) -> Optional[str]:
+        """Строка для отчета или None, если сжатых файлов не было."""
+        with self._lock:
+            if not self.files:
+                return None
+            ratio = self.raw_bytes / self.stored_bytes if self.stored_bytes else 0.0
+            throughput = self.raw_bytes / self.seconds / 1_000_000 if self.seconds > 0 else 0.0
+            text = (
+                f"Сжатие: файлов {self.files}, {self.raw_bytes} -> {self.stored_bytes} байт "
+                f"(x{ratio:.2f}), {throughput:.1f} МБ/с"
+            )
+        if reset:
+            self.reset()
+        return text
+
+
+# Статистика сжатия всех записей процесса
+compression_stats = CompressionStats()
+
+
+def dataset_path(
+    output_dir: Path,
+    ticker: str,
+    dataset: str,
+    compression: Optional[str] = None,
+) -> Path:
+    """
+    Путь к файлу набора данных: <TICKER>_<dataset>.csv[.gz|.zst].
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Неизвестный формат сжатия: {compression!r}")
+    return output_dir / f"{ticker}_{dataset}.csv{COMPRESSION_SUFFIXES[compression]}"
+
+
+@contextmanager
+def _open_text_writer(
+    path: Path,
+    compression: Optional[str],
+) -> Iterator[Tuple[TextIO, _CountingWriter]]:
+    """
+    Открывает текстовый поток для записи CSV со сжатием «на лету».
+
+    Возвращает сам поток и счетчик несжатых байт для статистики.
+    """
+    level = config.COMPRESSION_LEVELS.get(compression)
+
+    with ExitStack() as stack:
+        binary = stack.enter_context(path.open("wb"))
+
+        if compression == "gzip":
+            binary = stack.enter_context(
+                gzip.GzipFile(fileobj=binary, mode="wb", compresslevel=level, mtime=0)
+            )
+        elif compression == "zstd":
+            zstandard = _import_zstd()
+            binary = stack.enter_context(
+                zstandard.ZstdCompressor(level=level).stream_writer(binary, closefd=False)
+            )
+
+        counter = _CountingWriter(binary)
+        text = stack.enter_context(io.TextIOWrapper(counter, encoding="utf-8", newline=""))
+        yield text, counter
+
+
+def _format_column(values: List[Any]) -> List[str]:
+    """
+    Форматирует столбец значений так же, как csv.writer:
+    None — пустая строка, float — repr (кратчайшая запись, которая
+    читается обратно в то же число), остальное — str.
+
+    Типы в столбце обычно однородны (даты — str, цены — float или None),
+    поэтому сначала выбирается путь без проверок на каждое значение.
+    """
+    types = set(map(type, values))
+
+    if types <= {str}:
+        cells = values
+    elif types <= {float, type(None)}:
+        cells = [repr(v) if v is not None else "" for v in values]
+    else:
+        cells = ["" if v is None else repr(v) if type(v) is float else str(v) for v in values]
+
+    if str not in types:
+        # repr(float), str(int) и т.п. не содержат символов, требующих кавычек
+        return cells
+
+    # Одна проверка по всему столбцу; экранируем, только если нужно
+    joined = "".join(cells)
+    if any(char in joined for char in _QUOTED_CHARS):
+        cells = [
+            '"' + cell.replace('"', '""') + '"' if _NEEDS_QUOTING.search(cell) else cell
+            for cell in cells
+        ]
+    return cells
+
+
+def format_csv(header: List[str], columns: List[List[Any]]) -> str:
+    """
+    Форматирует таблицу, заданную столбцами, в текст CSV целиком.
+    """
+    lines = [",".join(_format_column(header))]
+    lines.extend(map(",".join, zip(*(_format_column(column) for column in columns))))
+    if len(header) == 1:
+        # csv.writer пишет единственное пустое поле строки как "",
+        # чтобы строка не читалась как пустая
+        lines = [line or '""' for line in lines]
+    lines.append("")
+    return "\r\n".join(lines)
+
+
+def _remove_other_formats(
+    output_dir: Path,
+    ticker: str,
+    dataset: str,
+    compression: Optional[str],
+) -> None:
+    """
+    Удаляет файлы набора данных в других форматах, оставшиеся
+    после смены сжатия, чтобы читатели не получили устаревшие данные.
+    """
+    for other in COMPRESSION_SUFFIXES:
+        if other == compression:
+            continue
+        stale = dataset_path(output_dir, ticker, dataset, other)
+        if stale.exists():
+            stale.unlink()
+            logger.info(f"[{ticker}] Удален файл в прежнем формате: {stale}")
+
+
+def _write_csv(
+    ticker: str,
+    dataset: str,
+    header: List[str],
+    columns: List[List[Any]],
+    output_dir: Path,
+    compression: Optional[str],
+) -> Path:
+    output_dir.mkdir(parents=True, exist_ok=True)
+    filename = dataset_path(output_dir, ticker, dataset, compression)
+
+    text = format_csv(header, columns)
+    # Замеряется только запись со сжатием, без форматирования CSV
+    started = time.perf_counter()
+    with _open_text_writer(filename, compression) as (f, counter):
+        f.write(text)
+    elapsed = time.perf_counter() - started
+
+    _remove_other_formats(output_dir, ticker, dataset, compression)
+
+    if compression is not None:
+        raw_size = counter.bytes_written
+        stored_size = filename.stat().st_size
+        ratio = raw_size / stored_size if stored_size else 0.0
+        throughput = raw_size / elapsed / 1_000_000 if elapsed > 0 else 0.0
+        compression_stats.add(raw_size, stored_size, elapsed)
+        logger.info(
+            f"[{ticker}] {compression}: {raw_size} -> {stored_size} байт "
+            f"(x{ratio:.2f}), {throughput:.1f} МБ/с"
+        )
+
+    return filename
+
 
 def save_dividends_to_csv(
     ticker: str,
     records: List[Dict],
     output_dir: Path,
+    compression: Optional[str] = None,
 ) -> Path:
     """
-    Сохраняет дивиденды в CSV-файл <TICKER>_dividends.csv.
+    Сохраняет дивиденды в CSV-файл <TICKER>_dividends.csv
+    (с суффиксом .gz / .zst при сжатии).
 
     Формат строк:
         date,value,currency
     """
-    output_dir.mkdir(parents=True, exist_ok=True)
-    filename = output_dir / f"{ticker}_dividends.csv"
-
-    with filename.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["date", "value", "currency"])
-        for item in records:
-            writer.writerow(
-                [
-                    item.get("date"),
-                    item.get("value"),
-                    item.get("currency"),
-                ]
-            )
+    columns = [
+        [item.get("date") for item in records],
+        [item.get("value") for item in records],
+        [item.get("currency") for item in records],
+    ]
+    filename = _write_csv(
+        ticker, "dividends", ["date", "value", "currency"], columns, output_dir, compression
+    )
 
     logger.info(f"[{ticker}] Дивиденды сохранены в {filename}")
     return filename
@@ -47,26 +299,105 @@ def save_prices_to_csv(
     ticker: str,
     records: List[Dict],
     output_dir: Path,
+    compression: Optional[str] = None,
 ) -> Path:
     """
-    Сохраняет историю цен закрытия в CSV-файл <TICKER>_prices.csv.
+    Сохраняет историю цен закрытия в CSV-файл <TICKER>_prices.csv
+    (с суффиксом .gz / .zst при сжатии).
 
     Формат строк:
         date,close
     """
-    output_dir.mkdir(parents=True, exist_ok=True)
-    filename = output_dir / f"{ticker}_prices.csv"
-
-    with filename.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow(["date", "close"])
-        for item in records:
-            writer.writerow(
-                [
-                    item.get("date"),
-                    item.get("close"),
-                ]
-            )
+    columns = [
+        [item.get("date") for item in records],
+        [item.get("close") for item in records],
+    ]
+    filename = _write_csv(ticker, "prices", ["date", "close"], columns, output_dir, compression)
 
     logger.info(f"[{ticker}] История цен сохранена в {filename}")
     return filename
+
+
+def find_dataset(output_dir: Path, ticker: str, dataset: str) -> Optional[Path]:
+    """
+    Ищет файл набора данных тикера в любом из поддерживаемых форматов.
+
+    Файлы в прежних форматах удаляются при записи; если несколько
+    все же есть (запись прервалась), возвращает самый свежий.
+    """
+    candidates = [
+        dataset_path(output_dir, ticker, dataset, compression)
+        for compression in COMPRESSION_SUFFIXES
+    ]
+    candidates = [path for path in candidates if path.exists()]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda p: p.stat().st_mtime)
+
+
+@contextmanager
+def open_dataset(path: Path) -> Iterator[TextIO]:
+    """
+    Открывает CSV-файл на чтение, распознавая сжатие по сигнатуре файла
+    (а не по расширению).
+    """
+    with path.open("rb") as raw:
+        magic = raw.read(4)
+        raw.seek(0)
+
+        if magic.startswith(_GZIP_MAGIC):
+            binary = gzip.GzipFile(fileobj=raw, mode="rb")
+        elif magic.startswith(_ZSTD_MAGIC):
+            binary = _import_zstd().ZstdDecompressor().stream_reader(raw, closefd=False)
+        else:
+            binary = raw
+
+        with io.TextIOWrapper(binary, encoding="utf-8", newline="") as text:
+            yield text
+
+
+def _to_float(value: str) -> Optional[float]:
+    return float(value) if value else None
+
+
+def read_dividends_csv(path: Path) -> List[Dict]:
+    """
+    Читает файл дивидендов (в любом формате) в список словарей
+    того же вида, что возвращает moex_client.fetch_dividends.
+    """
+    with open_dataset(path) as f:
+        return [
+            {
+                "date": row["date"],
+                "value": _to_float(row["value"]),
+                "currency": row["currency"],
+            }
+            for row in csv.DictReader(f)
+        ]
+
+
+def read_prices_csv(path: Path) -> List[Dict]:
+    """
+    Читает файл цен закрытия (в любом формате) в список словарей
+    того же вида, что возвращает moex_client.fetch_full_history.
+    """
+    with open_dataset(path) as f:
+        return [
+            {
+                "date": row["date"],
+                "close": _to_float(row["close"]),
+            }
+            for row in csv.DictReader(f)
+        ]
+
+
+def splice_records(existing: List[Dict], fetched: List[Dict]) -> List[Dict]:
+    """
+    Вклеивает загруженные записи в сохраненный ряд.
+
+    Дубликаты дат удаляются (приоритет у загруженных записей),
+    результат упорядочен по дате.
+    """
+    by_date = {item["date"]: item for item in existing}
+    by_date.update((item["date"], item) for item in fetched)
+    return [by_date[date] for date in sorted(by_date)]
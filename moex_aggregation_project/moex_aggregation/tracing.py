@@ -0,0 +1,207 @@
+"""
+Модуль для трассировки выполнения по времени.
+
+Трассировщик записывает интервалы (spans) — ожидание семафора, запросы
+страниц, разбор JSON, запись файлов в пуле потоков — и сохраняет их
+в формате Chrome trace-event (trace.json). Файл открывается в
+https://ui.perfetto.dev или chrome://tracing.
+
+Каждый тикер выводится отдельной «дорожкой» (lane): тикер записывается
+в contextvar, который asyncio копирует в каждую задачу, поэтому вложенные
+вызовы не нужно явно передавать имя тикера.
+
+run_in_executor контекст не копирует, поэтому функции для пула потоков
+оборачиваются в traced_call: дорожка берется в момент постановки
+в очередь, а в потоке пула записываются ожидание свободного потока
+(executor_queue) и сама работа — на дорожке тикера и на дорожке потока.
+
+По умолчанию трассировка выключена, и span() возвращает общий пустой
+контекстный менеджер. Во включенном состоянии запись одного интервала —
+это два вызова perf_counter_ns и добавление кортежа в список.
+"""
+
+from __future__ import annotations
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_current_lane: ContextVar[str] = ContextVar("trace_lane", default="main")
+
+# (name, lane, start_ns, end_ns, args)
+_Event = Tuple[str, str, int, int, Dict[str, Any]]
+
+
+class Tracer:
+    """Накопитель интервалов с экспортом в формат Chrome trace-event."""
+
+    def __init__(self) -> None:
+        self.events: List[_Event] = []
+        self._origin_ns = time.perf_counter_ns()
+
+    def record(
+        self,
+        name: str,
+        lane: str,
+        start_ns: int,
+        end_ns: int,
+        args: Dict[str, Any],
+    ) -> None:
+        # list.append атомарен под GIL — можно вызывать из потоков пула
+        self.events.append((name, lane, start_ns, end_ns, args))
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Преобразует записанные интервалы в словарь формата Chrome trace-event."""
+        pid = os.getpid()
+        lanes: Dict[str, int] = {}
+        trace_events: List[Dict[str, Any]] = []
+
+        for name, lane, start_ns, end_ns, args in self.events:
+            tid = lanes.setdefault(lane, len(lanes) + 1)
+            trace_events.append(
+                {
+                    "name": name,
+                    "cat": "moex",
+                    "ph": "X",
+                    "ts": (start_ns - self._origin_ns) / 1000,
+                    "dur": (end_ns - start_ns) / 1000,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": args,
+                }
+            )
+
+        for lane, tid in lanes.items():
+            trace_events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": lane},
+                }
+            )
+
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: Path) -> Path:
+        """Сохраняет трассировку в JSON-файл."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+
+        logger.info(f"Трассировка ({len(self.events)} интервалов) сохранена в {path}")
+        return path
+
+
+class _Span:
+    __slots__ = ("_tracer", "_name", "_args", "_lane", "_start_ns")
+
+    def __init__(self, tracer: Tracer, name: str, args: Dict[str, Any]) -> None:
+        self._tracer = tracer
+        self._name = name
+        self._args = args
+
+    def __enter__(self) -> "_Span":
+        self._lane = _current_lane.get()
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        end_ns = time.perf_counter_ns()
+        if exc_type is not None:
+            self._args["error"] = exc_type.__name__
+        self._tracer.record(self._name, self._lane, self._start_ns, end_ns, self._args)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NULL_SPAN = _NullSpan()
+_tracer: Optional[Tracer] = None
+
+
+def enable() -> Tracer:
+    """Включает трассировку и возвращает активный трассировщик."""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable() -> Optional[Tracer]:
+    """Выключает трассировку и возвращает трассировщик с накопленными данными."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def span(name: str, **args: Any):
+    """
+    Контекстный менеджер для записи интервала:
+
+        with tracing.span("fetch_history_page", start=100):
+            ...
+
+    Если трассировка выключена, ничего не делает.
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, args)
+
+
+def traced_call(
+    name: str,
+    func: Callable[..., Any],
+    *args: Any,
+    **attrs: Any,
+) -> Callable[[], Any]:
+    """
+    Готовит вызов func(*args) для run_in_executor с записью интервалов:
+
+        await loop.run_in_executor(
+            executor,
+            tracing.traced_call("write_prices", storage.save_prices_to_csv, ticker, ...),
+        )
+
+    Вызывать в цикле событий (в момент постановки задачи в очередь пула).
+    Если трассировка выключена, возвращает functools.partial без накладных расходов.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return functools.partial(func, *args)
+
+    lane = _current_lane.get()
+    submitted_ns = time.perf_counter_ns()
+
+    def run() -> Any:
+        started_ns = time.perf_counter_ns()
+        thread = threading.current_thread().name
+        tracer.record("executor_queue", lane, submitted_ns, started_ns, dict(attrs))
+        try:
+            return func(*args)
+        finally:
+            end_ns = time.perf_counter_ns()
+            tracer.record(name, lane, started_ns, end_ns, {**attrs, "thread": thread})
+            tracer.record(name, thread, started_ns, end_ns, {**attrs, "lane": lane})
+
+    return run
+
+
+def set_lane(lane: str) -> None:
+    """Задает дорожку (обычно тикер) для текущей задачи asyncio."""
+    _current_lane.set(lane)
@@ -0,0 +1,308 @@
+"""
+Модуль транспорта HTTP-запросов для moex_client.
+
+Транспорт — объект с методом get(session, url, params) -> bytes,
+возвращающий тело успешного ответа. Реализации:
+
+- HttpTransport — обычные запросы через aiohttp (по умолчанию);
+- RecordingTransport — выполняет запросы через другой транспорт
+  и записывает ответы в архив — в том числе ошибки (статус-код,
+  таймаут, любые другие aiohttp.ClientError), которые при
+  воспроизведении поднимаются исключением того же типа;
+- ReplayTransport — отдает ответы из архива без обращения к сети
+  (архив отображается в память через mmap), при необходимости
+  с эмуляцией исходного времени ответа.
+
+Запись/воспроизведение позволяет повторить вчерашнюю загрузку
+офлайн и профилировать разбор JSON и запись файлов на реальных данных.
+
+Формат архива — MAGIC и записи подряд, каждая:
+    заголовок (<IIHd): длина ключа, длина тела, статус, время ответа
+    ключ запроса (UTF-8)
+    тело ответа, сжатое zlib (для ошибок — "ИмяКласса\nтекст ошибки")
+
+Отдельного индекса нет: записи дописываются и сбрасываются на диск
+по одной, а при чтении индекс строится проходом по архиву. Поэтому
+архив прерванного запуска читается целиком, кроме, возможно,
+недописанной последней записи.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import mmap
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, NoReturn, Optional, Protocol, Tuple
+from urllib.parse import urlencode
+
+import aiohttp
+from multidict import CIMultiDict, CIMultiDictProxy
+from yarl import URL
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_MAGIC = b"MOEXREC2"
+_HEADER = struct.Struct("<IIHd")
+
+# Статусы записей, не являющиеся HTTP-кодами
+STATUS_TIMEOUT = 1
+STATUS_CLIENT_ERROR = 2
+STATUS_OK = 200
+
+# (offset, length, status, elapsed)
+_Entry = Tuple[int, int, int, float]
+
+
+class ReplayMissError(LookupError):
+    """В архиве нет ответа на запрос."""
+
+
+def request_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Ключ запроса в архиве: URL с отсортированными параметрами."""
+    if not params:
+        return url
+    return f"{url}?{urlencode(sorted(params.items()))}"
+
+
+class Transport(Protocol):
+    """Интерфейс транспорта, используемого moex_client.fetch_json."""
+
+    async def get(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> bytes: ...
+
+    async def close(self) -> None: ...
+
+
+class HttpTransport:
+    """Обычные HTTP-запросы через сессию aiohttp."""
+
+    async def get(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> bytes:
+        """
+        Выполняет GET-запрос и возвращает тело ответа.
+
+        При ошибочном статус-коде поднимает исключение aiohttp.ClientResponseError.
+        """
+        async with session.get(url, params=params) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    async def close(self) -> None:
+        pass
+
+
+class RecordingTransport:
+    """
+    Транспорт, записывающий ответы в архив.
+
+    Записываются и успешные ответы, и ошибки: HTTP-статус
+    (aiohttp.ClientResponseError), таймауты и остальные aiohttp.ClientError
+    (обрыв соединения, недополученное тело ответа и т.п.) — с именем класса.
+    Сжатие и запись выполняются в пуле потоков по умолчанию,
+    чтобы не блокировать цикл событий.
+    """
+
+    def __init__(self, path: Path, inner: Optional[Transport] = None) -> None:
+        self.path = path
+        self._inner = inner or HttpTransport()
+        self._lock = threading.Lock()
+        self._count = 0
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = path.open("wb")
+        self._file.write(ARCHIVE_MAGIC)
+        self._file.flush()
+
+    async def get(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> bytes:
+        key = request_key(url, params)
+        started = time.perf_counter()
+        try:
+            body = await self._inner.get(session, url, params)
+        except aiohttp.ClientResponseError as e:
+            await self._record(key, e.status, e.message.encode("utf-8"), started)
+            raise
+        except asyncio.TimeoutError as e:
+            # Раньше ClientError: ServerTimeoutError наследует обоим
+            await self._record(key, STATUS_TIMEOUT, _describe_error(e), started)
+            raise
+        except aiohttp.ClientError as e:
+            await self._record(key, STATUS_CLIENT_ERROR, _describe_error(e), started)
+            raise
+
+        await self._record(key, STATUS_OK, body, started)
+        return body
+
+    async def _record(self, key: str, status: int, body: bytes, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._append, key, status, body, elapsed)
+
+    def _append(self, key: str, status: int, body: bytes, elapsed: float) -> None:
+        encoded_key = key.encode("utf-8")
+        packed = zlib.compress(body)
+        header = _HEADER.pack(len(encoded_key), len(packed), status, elapsed)
+        with self._lock:
+            # Запись целиком одним write и сразу на диск: при падении
+            # процесса теряется не больше одной (последней) записи
+            self._file.write(header + encoded_key + packed)
+            self._file.flush()
+            self._count += 1
+
+    async def close(self) -> None:
+        """Закрывает архив."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._finish)
+        await self._inner.close()
+
+    def _finish(self) -> None:
+        with self._lock:
+            self._file.close()
+
+        logger.info(f"Записано ответов: {self._count} в архив {self.path}")
+
+
+def _describe_error(error: BaseException) -> bytes:
+    return f"{type(error).__name__}\n{error}".encode("utf-8")
+
+
+def _restore_error(body: str, default: type) -> BaseException:
+    """
+    Создает исключение по записи "ИмяКласса\nтекст": класс ищется среди
+    исключений aiohttp. Если у класса особый конструктор, берется
+    ближайший базовый класс, который создается из одного сообщения.
+    """
+    name, _, message = body.partition("\n")
+    cls = getattr(aiohttp, name, None)
+    if not (isinstance(cls, type) and issubclass(cls, default)):
+        return default(message)
+
+    for base in cls.__mro__:
+        if issubclass(base, default):
+            try:
+                return base(message)
+            except TypeError:
+                continue
+    return default(message)
+
+
+def _replay_error(url: str, status: int, body: str) -> NoReturn:
+    """Поднимает исключение того же типа, что и при записи ответа."""
+    if status == STATUS_TIMEOUT:
+        raise _restore_error(body, asyncio.TimeoutError)
+    if status == STATUS_CLIENT_ERROR:
+        raise _restore_error(body, aiohttp.ClientError)
+
+    request_url = URL(url)
+    request_info = aiohttp.RequestInfo(
+        url=request_url,
+        method="GET",
+        headers=CIMultiDictProxy(CIMultiDict()),
+        real_url=request_url,
+    )
+    raise aiohttp.ClientResponseError(request_info, (), status=status, message=body)
+
+
+class ReplayTransport:
+    """
+    Транспорт, отдающий ответы из архива RecordingTransport.
+
+    Если один и тот же запрос записан несколько раз (например, несколько
+    циклов демона), ответы отдаются в порядке записи, а после исчерпания
+    повторяется последний. Записанные ошибки поднимаются тем же
+    исключением, что и при записи.
+
+    emulate_timing=True — перед ответом выжидается исходное время
+    запроса, деленное на speed.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        emulate_timing: bool = False,
+        speed: float = 1.0,
+    ) -> None:
+        self.path = path
+        self.emulate_timing = emulate_timing
+        self.speed = speed
+
+        self._file = path.open("rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._entries = self._read_index()
+        self._served: Dict[str, int] = {}
+
+        logger.info(f"Архив {path}: {sum(map(len, self._entries.values()))} ответов")
+
+    def _read_index(self) -> Dict[str, List[_Entry]]:
+        """Строит индекс проходом по записям архива."""
+        mm = self._mm
+        if mm[: len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+            raise ValueError(f"Файл не является архивом ответов: {self.path}")
+
+        entries: Dict[str, List[_Entry]] = {}
+        position = len(ARCHIVE_MAGIC)
+        size = len(mm)
+
+        while position + _HEADER.size <= size:
+            key_length, length, status, elapsed = _HEADER.unpack_from(mm, position)
+            key_offset = position + _HEADER.size
+            offset = key_offset + key_length
+            if offset + length > size:
+                break
+
+            key = mm[key_offset:offset].decode("utf-8")
+            entries.setdefault(key, []).append((offset, length, status, elapsed))
+            position = offset + length
+
+        if position != size:
+            logger.warning(
+                f"Архив {self.path} обрывается на недописанной записи "
+                f"({size - position} байт отброшено)"
+            )
+        return entries
+
+    async def get(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> bytes:
+        key = request_key(url, params)
+        responses = self._entries.get(key)
+        if not responses:
+            raise ReplayMissError(f"В архиве нет ответа на запрос: {key}")
+
+        n = self._served.get(key, 0)
+        self._served[key] = n + 1
+        offset, length, status, elapsed = responses[min(n, len(responses) - 1)]
+
+        if self.emulate_timing:
+            await asyncio.sleep(elapsed / self.speed)
+
+        with memoryview(self._mm) as view:
+            body = zlib.decompress(view[offset : offset + length])
+
+        if status != STATUS_OK:
+            _replay_error(key, status, body.decode("utf-8"))
+        return body
+
+    async def close(self) -> None:
+        self._mm.close()
+        self._file.close()
@@ -0,0 +1,366 @@
+"""
+Модуль проверки и точечного восстановления сохраненной истории цен.
+
+Пагинация по смещению (start) в fetch_full_history может пропустить
+или продублировать строки, если ISS добавляет данные во время загрузки.
+Здесь:
+- векторная (numpy) проверка сохраненных рядов: дубликаты дат,
+  нарушение порядка и пропуски относительно торгового календаря;
+- восстановление: запрос только пропущенных окон дат (from/till)
+  и вклейка их в сохраненный ряд — вместо полной перезагрузки.
+
+Торговый календарь режима торгов (TQBR) строится по истории эталонного
+тикера (CALENDAR_REFERENCE_TICKER), загруженной из ISS, дополненной датами
+сохраненных тикеров, и для каждого тикера ограничивается границами его
+истории из /dates.json. Даты эталона кэшируются в reference_calendar.json:
+при повторных проверках догружаются только новые даты (from=<последняя>),
+то есть обычно один запрос.
+
+Даты, которые ISS не вернул при запросе окна (например, остановка торгов
+бумагой), записываются в known_gaps.json и больше не считаются пропусками
+и не запрашиваются повторно.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import aiohttp
+import numpy as np
+
+from . import config
+from . import moex_client
+from . import storage
+from . import tracing
+from .service import create_session
+from .tickers import ticker_generator
+
+logger = logging.getLogger(__name__)
+
+
+class SeriesReport(NamedTuple):
+    """Результат проверки ряда цен одного тикера."""
+
+    ticker: str
+    rows: int
+    duplicates: np.ndarray
+    out_of_order: np.ndarray
+    missing: np.ndarray
+
+    @property
+    def ok(self) -> bool:
+        return not (len(self.duplicates) or len(self.out_of_order) or len(self.missing))
+
+    def summary(self) -> str:
+        return (
+            f"[{self.ticker}] строк: {self.rows}, дубликатов: {len(self.duplicates)}, "
+            f"нарушений порядка: {len(self.out_of_order)}, пропусков: {len(self.missing)}"
+        )
+
+
+def to_dates(records: List[Dict]) -> np.ndarray:
+    """Даты записей в исходном порядке как массив datetime64[D]."""
+    return np.array([item["date"] for item in records], dtype="datetime64[D]")
+
+
+def board_calendar(series: List[np.ndarray]) -> np.ndarray:
+    """Торговый календарь: отсортированное объединение дат всех рядов режима."""
+    if not series:
+        return np.array([], dtype="datetime64[D]")
+    return np.unique(np.concatenate(series))
+
+
+async def fetch_reference_dates(
+    session: aiohttp.ClientSession,
+    date_from: Optional[str] = None,
+    date_till: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Даты торгов режима по истории эталонного тикера из ISS
+    (в окне date_from..date_till, чтобы не загружать лишнее).
+    """
+    ticker = config.CALENDAR_REFERENCE_TICKER
+    records = await moex_client.fetch_full_history(
+        session, ticker, date_from=date_from, date_till=date_till
+    )
+    return np.unique(to_dates(records))
+
+
+def reference_calendar_path(output_dir: Path) -> Path:
+    return output_dir / config.REFERENCE_CALENDAR_FILENAME
+
+
+def load_reference_calendar(path: Path) -> np.ndarray:
+    """Читает кэш дат эталонного тикера (пустой, если эталон сменился)."""
+    empty = np.array([], dtype="datetime64[D]")
+    if not path.exists():
+        return empty
+    with path.open("r", encoding="utf-8") as f:
+        raw = json.load(f)
+    if raw.get("ticker") != config.CALENDAR_REFERENCE_TICKER:
+        return empty
+    return np.array(raw.get("dates", []), dtype="datetime64[D]")
+
+
+def save_reference_calendar(path: Path, dates: np.ndarray) -> None:
+    """Сохраняет кэш дат эталонного тикера в JSON."""
+    raw = {
+        "ticker": config.CALENDAR_REFERENCE_TICKER,
+        "dates": [str(date) for date in dates],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(raw, f)
+
+
+async def update_reference_calendar(
+    session: aiohttp.ClientSession,
+    path: Path,
+    date_from: Optional[str] = None,
+) -> np.ndarray:
+    """
+    Возвращает даты эталонного тикера начиная с date_from, догружая
+    в кэш только недостающее: даты после последней сохраненной
+    (она тоже запрашивается — страница не пустая) и, если нужно,
+    даты до первой сохраненной.
+    """
+    cached = load_reference_calendar(path)
+    if not len(cached):
+        windows: List[Tuple[Optional[str], Optional[str]]] = [(date_from, None)]
+    else:
+        windows = [(str(cached[-1]), None)]
+        if date_from is not None and np.datetime64(date_from, "D") < cached[0]:
+            windows.append((date_from, str(cached[0])))
+
+    fetched = [await fetch_reference_dates(session, lo, hi) for lo, hi in windows]
+    dates = board_calendar([cached, *fetched])
+    if len(dates) != len(cached):
+        save_reference_calendar(path, dates)
+
+    logger.info(
+        f"Эталонный календарь ({config.CALENDAR_REFERENCE_TICKER}): "
+        f"дат в кэше {len(cached)}, запрошено окон {len(windows)}, стало {len(dates)}"
+    )
+    return dates
+
+
+def known_gaps_path(output_dir: Path) -> Path:
+    return output_dir / config.KNOWN_GAPS_FILENAME
+
+
+def load_known_gaps(path: Path) -> Dict[str, np.ndarray]:
+    """Читает известные пропуски: {тикер: массив дат}."""
+    if not path.exists():
+        return {}
+    with path.open("r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {ticker: np.array(dates, dtype="datetime64[D]") for ticker, dates in raw.items()}
+
+
+def save_known_gaps(path: Path, gaps: Dict[str, np.ndarray]) -> None:
+    """Сохраняет известные пропуски в JSON."""
+    raw = {
+        ticker: [str(date) for date in np.unique(dates)]
+        for ticker, dates in sorted(gaps.items())
+        if len(dates)
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(raw, f, ensure_ascii=False, indent=2)
+
+
+def validate_series(
+    ticker: str,
+    dates: np.ndarray,
+    calendar: np.ndarray,
+    date_from: Optional[str] = None,
+    date_till: Optional[str] = None,
+    known_gaps: Optional[np.ndarray] = None,
+) -> SeriesReport:
+    """
+    Проверяет ряд дат тикера (в порядке хранения в файле).
+
+    Пропуски ищутся по календарю в границах date_from..date_till
+    (по умолчанию — от первой до последней сохраненной даты),
+    даты из known_gaps пропусками не считаются.
+    """
+    unique, counts = np.unique(dates, return_counts=True)
+    duplicates = unique[counts > 1]
+    out_of_order = dates[1:][np.diff(dates) < np.timedelta64(0, "D")]
+
+    if len(unique):
+        lo = np.datetime64(date_from, "D") if date_from else unique[0]
+        hi = np.datetime64(date_till, "D") if date_till else unique[-1]
+        window = calendar[(calendar >= lo) & (calendar <= hi)]
+        missing = np.setdiff1d(window, unique, assume_unique=True)
+        if known_gaps is not None and len(known_gaps):
+            missing = np.setdiff1d(missing, known_gaps)
+    else:
+        missing = np.array([], dtype="datetime64[D]")
+
+    return SeriesReport(ticker, len(dates), duplicates, out_of_order, missing)
+
+
+def missing_windows(missing: np.ndarray, calendar: np.ndarray) -> List[Tuple[str, str]]:
+    """
+    Группирует пропущенные даты в окна подряд идущих торговых дней.
+
+    Возвращает список (from, till) в формате "YYYY-MM-DD" — по одному
+    запросу на окно вместо запроса на каждую дату.
+    """
+    if not len(missing):
+        return []
+
+    positions = np.searchsorted(calendar, missing)
+    breaks = np.flatnonzero(np.diff(positions) != 1) + 1
+    return [
+        (str(window[0]), str(window[-1]))
+        for window in np.split(missing, breaks)
+    ]
+
+
+async def repair_ticker(
+    session: aiohttp.ClientSession,
+    executor: ThreadPoolExecutor,
+    report: SeriesReport,
+    records: List[Dict],
+    calendar: np.ndarray,
+) -> np.ndarray:
+    """
+    Восстанавливает ряд тикера: загружает только пропущенные окна дат,
+    вклеивает их, удаляет дубликаты, упорядочивает и перезаписывает файл
+    (если что-то изменилось).
+
+    Возвращает пропущенные даты, которых нет и в ответе ISS, —
+    новые известные пропуски.
+    """
+    ticker = report.ticker
+    tracing.set_lane(ticker)
+    windows = missing_windows(report.missing, calendar)
+
+    fetched: List[Dict] = []
+    for date_from, date_till in windows:
+        fetched.extend(
+            await moex_client.fetch_full_history(
+                session, ticker, date_from=date_from, date_till=date_till
+            )
+        )
+
+    repaired = storage.splice_records(records, fetched)
+    empty = np.setdiff1d(report.missing, to_dates(fetched))
+    logger.info(
+        f"[{ticker}] Восстановление: запрошено окон {len(windows)}, "
+        f"получено записей {len(fetched)}, строк было {len(records)}, стало {len(repaired)}, "
+        f"новых известных пропусков {len(empty)}"
+    )
+
+    if repaired != records:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            executor,
+            tracing.traced_call(
+                "write_prices",
+                storage.save_prices_to_csv,
+                ticker,
+                repaired,
+                config.OUTPUT_DIR,
+                config.PRICES_COMPRESSION,
+                ticker=ticker,
+                rows=len(repaired),
+            ),
+        )
+    return empty
+
+
+async def run_validation(repair: bool = False) -> List[SeriesReport]:
+    """
+    Проверяет сохраненную историю цен всех тикеров из файла,
+    при repair=True — восстанавливает найденные проблемы.
+    """
+    executor = ThreadPoolExecutor(max_workers=config.MAX_WORKERS)
+    loop = asyncio.get_running_loop()
+
+    stored: Dict[str, List[Dict]] = {}
+    async for ticker in ticker_generator(config.TICKERS_FILE):
+        ticker = ticker.strip().upper()
+        path = storage.find_dataset(config.OUTPUT_DIR, ticker, "prices")
+        if path is None:
+            logger.warning(f"[{ticker}] Сохраненная история цен не найдена.")
+            continue
+        stored[ticker] = await loop.run_in_executor(executor, storage.read_prices_csv, path)
+
+    dates = {ticker: to_dates(records) for ticker, records in stored.items()}
+    gaps_path = known_gaps_path(config.OUTPUT_DIR)
+    known_gaps = load_known_gaps(gaps_path)
+    semaphore = asyncio.Semaphore(config.MAX_CONCURRENT_REQUESTS)
+
+    async def history_bounds(ticker: str) -> Tuple[Optional[str], Optional[str]]:
+        async with semaphore:
+            try:
+                return await moex_client.fetch_history_dates(session, ticker)
+            except Exception as e:
+                logger.warning(
+                    f"[{ticker}] Границы истории не получены ({e}), "
+                    f"проверяем в пределах сохраненных дат."
+                )
+                return None, None
+
+    async def check(ticker: str) -> SeriesReport:
+        date_from, date_till = bounds[ticker]
+        report = validate_series(
+            ticker, dates[ticker], calendar, date_from, date_till, known_gaps.get(ticker)
+        )
+        logger.info(report.summary())
+
+        if repair and not report.ok:
+            async with semaphore:
+                try:
+                    empty = await repair_ticker(
+                        session, executor, report, stored[ticker], calendar
+                    )
+                except Exception as e:
+                    logger.exception(f"[{ticker}] Ошибка при восстановлении: {e}")
+                else:
+                    if len(empty):
+                        known_gaps[ticker] = np.concatenate(
+                            [known_gaps.get(ticker, empty[:0]), empty]
+                        )
+        return report
+
+    async with create_session() as session:
+        tickers = list(stored)
+        bounds = dict(zip(tickers, await asyncio.gather(*map(history_bounds, tickers))))
+
+        # Эталон нужен только с самой ранней даты, которую будем проверять
+        starts = [str(d.min()) for d in dates.values() if len(d)]
+        starts += [date_from for date_from, _ in bounds.values() if date_from]
+        earliest = min(starts, default=None)
+
+        series = list(dates.values())
+        try:
+            series.append(
+                await update_reference_calendar(
+                    session, reference_calendar_path(config.OUTPUT_DIR), earliest
+                )
+            )
+        except Exception as e:
+            logger.warning(
+                f"Эталонный календарь ({config.CALENDAR_REFERENCE_TICKER}) не получен ({e}), "
+                f"используем только даты сохраненных тикеров."
+            )
+        calendar = board_calendar(series)
+
+        reports = await asyncio.gather(*map(check, tickers))
+
+    if repair:
+        save_known_gaps(gaps_path, known_gaps)
+
+    executor.shutdown(wait=True)
+    failed = sum(1 for report in reports if not report.ok)
+    logger.info(f"Проверено тикеров: {len(reports)}, с проблемами: {failed}")
+    return list(reports)
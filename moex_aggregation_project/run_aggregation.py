@@ -3,12 +3,32 @@
 
 Запуск:
     python run_aggregation.py
+    python run_aggregation.py --uvloop --lag-monitor
+    python run_aggregation.py --trace trace.json
+    python run_aggregation.py --daemon --interval 300
+    python run_aggregation.py --record run.moexrec
+    python run_aggregation.py --replay run.moexrec --replay-timing
+    python run_aggregation.py --validate
+    python run_aggregation.py --repair
+    python run_aggregation.py --prices-compression zstd --compression-level zstd=10
 """
 
+import argparse
 import asyncio
 import logging
+import time
+from pathlib import Path
+from typing import Tuple
 
+from moex_aggregation import config, moex_client, storage, tracing
+from moex_aggregation.daemon import run_daemon
+from moex_aggregation.event_loop import LoopLagMonitor, install_uvloop
 from moex_aggregation.service import run_all_tickers
+from moex_aggregation.transport import RecordingTransport, ReplayTransport
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_CHOICES = {"none": None, "gzip": "gzip", "zstd": "zstd"}
 
 
 def setup_logging() -> None:
@@ -22,12 +42,196 @@ def setup_logging() -> None:
     )
 
 
+def positive_int(value: str) -> int:
+    """Тип аргумента argparse: целое число больше нуля."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается целое число: {value!r}")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"ожидается число больше нуля: {number}")
+    return number
+
+
+def compression_level(value: str) -> Tuple[str, int]:
+    """Тип аргумента argparse: FORMAT=N с проверкой диапазона уровня для формата."""
+    compression, sep, level = value.partition("=")
+    if not sep or compression not in storage.COMPRESSION_LEVEL_RANGES:
+        formats = ", ".join(storage.COMPRESSION_LEVEL_RANGES)
+        raise argparse.ArgumentTypeError(f"ожидается FORMAT=N, где FORMAT — {formats}: {value!r}")
+    try:
+        number = int(level)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"уровень должен быть целым числом: {level!r}")
+
+    low, high = storage.COMPRESSION_LEVEL_RANGES[compression]
+    if not low <= number <= high:
+        raise argparse.ArgumentTypeError(
+            f"уровень {compression} должен быть от {low} до {high}: {number}"
+        )
+    return compression, number
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Агрегация данных ISS API MOEX")
+    parser.add_argument(
+        "--uvloop",
+        action="store_true",
+        default=config.USE_UVLOOP,
+        help="использовать цикл событий uvloop (если установлен)",
+    )
+    parser.add_argument(
+        "--lag-monitor",
+        action="store_true",
+        default=config.LOOP_LAG_MONITOR,
+        help="измерять задержку цикла событий и вывести ее в итогах",
+    )
+    parser.add_argument(
+        "--trace",
+        nargs="?",
+        type=Path,
+        const=config.TRACE_FILE,
+        default=None,
+        metavar="PATH",
+        help=f"записать трассировку в формате Chrome trace-event (по умолчанию {config.TRACE_FILE})",
+    )
+    parser.add_argument(
+        "--interval",
+        type=positive_int,
+        default=config.DAEMON_INTERVAL,
+        help=f"период обновления в режиме демона, секунды (по умолчанию {config.DAEMON_INTERVAL})",
+    )
+    parser.add_argument(
+        "--prices-compression",
+        choices=COMPRESSION_CHOICES,
+        help="сжатие файлов цен (по умолчанию — PRICES_COMPRESSION из config.py)",
+    )
+    parser.add_argument(
+        "--dividends-compression",
+        choices=COMPRESSION_CHOICES,
+        help="сжатие файлов дивидендов (по умолчанию — DIVIDENDS_COMPRESSION из config.py)",
+    )
+    parser.add_argument(
+        "--compression-level",
+        type=compression_level,
+        action="append",
+        metavar="FORMAT=N",
+        help=(
+            "уровень сжатия формата, можно повторять: gzip=0..9, zstd=1..22 "
+            "(по умолчанию — COMPRESSION_LEVELS из config.py)"
+        ),
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--daemon",
+        action="store_true",
+        help="работать постоянно, обновляя данные по расписанию торговой сессии",
+    )
+    mode.add_argument(
+        "--validate",
+        action="store_true",
+        help="проверить сохраненную историю цен на дубликаты, порядок и пропуски",
+    )
+    mode.add_argument(
+        "--repair",
+        action="store_true",
+        help="проверить сохраненную историю цен и дозагрузить только пропущенные даты",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--record",
+        type=Path,
+        metavar="PATH",
+        help="записать все ответы ISS API в архив для последующего воспроизведения",
+    )
+    source.add_argument(
+        "--replay",
+        type=Path,
+        metavar="PATH",
+        help="не обращаться к сети, а отдавать ответы из архива",
+    )
+    parser.add_argument(
+        "--replay-timing",
+        action="store_true",
+        help="при воспроизведении выдерживать исходное время ответов",
+    )
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> None:
+    """
+    Запуск обработки всех тикеров с итоговым отчетом.
+    """
+    monitor = LoopLagMonitor() if args.lag_monitor else None
+    if monitor is not None:
+        monitor.start()
+
+    transport = None
+    if args.record is not None:
+        transport = RecordingTransport(args.record)
+    elif args.replay is not None:
+        transport = ReplayTransport(args.replay, emulate_timing=args.replay_timing)
+    if transport is not None:
+        moex_client.set_transport(transport)
+
+    started = time.perf_counter()
+    try:
+        if args.daemon:
+            await run_daemon(interval=args.interval, monitor=monitor, trace_path=args.trace)
+        elif args.validate or args.repair:
+            # numpy нужен только для проверки, поэтому импорт — по требованию
+            from moex_aggregation.validation import run_validation
+
+            await run_validation(repair=args.repair)
+        else:
+            await run_all_tickers()
+    finally:
+        if monitor is not None:
+            await monitor.stop()
+        if transport is not None:
+            await transport.close()
+
+        logger.info(f"Итоги: время работы {time.perf_counter() - started:.2f} с")
+        # Демон выводит и сбрасывает эти метрики после каждого цикла,
+        # к концу работы в них остался бы только простой после последнего
+        if not args.daemon:
+            if monitor is not None:
+                logger.info(f"Итоги: {monitor.summary()}")
+            compression = storage.compression_stats.summary()
+            if compression is not None:
+                logger.info(f"Итоги: {compression}")
+
+
+def apply_storage_args(args: argparse.Namespace) -> None:
+    """Переопределяет настройки сжатия из config.py параметрами командной строки."""
+    if args.prices_compression is not None:
+        config.PRICES_COMPRESSION = COMPRESSION_CHOICES[args.prices_compression]
+    if args.dividends_compression is not None:
+        config.DIVIDENDS_COMPRESSION = COMPRESSION_CHOICES[args.dividends_compression]
+    if args.compression_level:
+        config.COMPRESSION_LEVELS = {**config.COMPRESSION_LEVELS, **dict(args.compression_level)}
+
+
 def main() -> None:
     setup_logging()
+    args = parse_args()
+    apply_storage_args(args)
+
+    if args.uvloop:
+        install_uvloop()
+
+    if args.trace is not None:
+        tracing.enable()
+
     try:
-        asyncio.run(run_all_tickers())
+        asyncio.run(run(args))
     except KeyboardInterrupt:
-        logging.getLogger(__name__).warning("Завершение по Ctrl+C")
+        logger.warning("Завершение по Ctrl+C")
+    finally:
+        tracer = tracing.disable()
+        # Демон сохраняет трассировку по циклам сам
+        if tracer is not None and not args.daemon:
+            tracer.dump(args.trace)
 
 
 if __name__ == "__main__":